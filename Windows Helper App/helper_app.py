@@ -21,28 +21,31 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 # -----------------------------------------------------------------------------
 import os
 import sys
-import json
+import re
 import threading
 import subprocess
 import socket
+import selectors
 import ctypes
 import logging
-import time
+import functools
+import signal
 import atexit
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs, unquote
-
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qsl
 
 try:
-    from infi.systray import SysTrayIcon
+    import orjson
 except ImportError:
-    sys.exit("Please install infi.systray: pip install infi.systray")
+    sys.exit("Please install orjson: pip install orjson")
 
 if os.name == "nt":
     import winreg
+    import msvcrt
+else:
+    import fcntl
 
 # -----------------------------------------------------------------------------
 # Constants & Global Variables
@@ -50,9 +53,41 @@ if os.name == "nt":
 APP_VERSION = "1.3.1"
 DEFAULT_PORT = 26270
 
+# Config key holding the executable path for each player name accepted by /launch
+PLAYER_KEY = {"mpc": "mpc_path", "vlc": "vlc_path"}
+
+# Fixed HTTP response bodies, encoded once
+ERR_MISSING = b'Launch request is missing required parameters'
+ERR_INVALID = b'Invalid media player specified. Only Media Player Classic and VLC are supported.'
+ERR_UNCONFIGURED = b'Media player paths are not configured in windows helper app'
+ERR_PLAYER_NOT_FOUND = b'Media player executable was not found. Please check the path in windows helper app settings'
+ERR_NOT_FOUND = b'<h1>Open in VLC / MPC-HC Windows Helper.<br><br>Invalid Request</h1>'
+LAUNCH_ACCEPTED = b'Media player launch requested'
+STATUS_RESPONSE = orjson.dumps({
+    'Name': 'Open in VLC / MPC-HC Windows Helper',
+    'version': APP_VERSION,
+    'status': 'running'
+})
+
 config = {}  # Global configuration dictionary.
 httpd = None
 settings_window_instance = None
+lock_fd = None  # Open descriptor of the instance lock file while this process owns it.
+shutdown_event = threading.Event()  # Set to make main() clean up and exit.
+signal_sockets = None  # Wakeup socketpair that turns console signals into request_shutdown().
+main_idle = False  # True once main() is parked on shutdown_event rather than busy with startup dialogs.
+tk = ttk = messagebox = filedialog = None  # tkinter modules, imported by ui_loop() on first UI use.
+ui_root = None  # Hidden Tk root that owns every window; only touched from ui_thread.
+ui_thread = None
+ui_thread_lock = threading.Lock()
+ui_ready = threading.Event()
+ui_error = None  # Exception raised while starting the UI thread, re-raised to every caller.
+theme_loaded = False
+WINDOW_BG_COLOR = "#EFEFEF"
+PORT_INPUT_RE = re.compile(r"\A[0-9]{0,5}\Z")  # Empty or up to 5 digits while typing.
+launch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="launcher")
+# Start players without a console window (Windows ignores CREATE_NO_WINDOW if DETACHED_PROCESS is also set)
+PLAYER_CREATION_FLAGS = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -62,8 +97,7 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 # -----------------------------------------------------------------------------
 documents_folder = os.path.join(os.path.expanduser("~"), "Documents")
 app_folder = os.path.join(documents_folder, "Open_In_VLC_MPC_Config")
-if not os.path.exists(app_folder):
-    os.makedirs(app_folder)
+os.makedirs(app_folder, exist_ok=True)
 
 CONFIG_FILE = os.path.join(app_folder, "helper_config.json")
 LOCK_FILE = os.path.join(app_folder, "app_instance.lock")
@@ -75,63 +109,111 @@ if getattr(sys, 'frozen', False):
     ICON_FILE = os.path.join(sys._MEIPASS, "Open_In_VLC_MPC_Helper.ico")
 else:
     ICON_FILE = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "Open_In_VLC_MPC_Helper.ico")
+ICON_EXISTS = os.path.isfile(ICON_FILE)
+
+# The ui_theme folder is bundled next to the icon, both by PyInstaller and in the source tree
+THEME_FILE = os.path.join(os.path.dirname(ICON_FILE), "ui_theme", "forest-light.tcl")
+
+# -----------------------------------------------------------------------------
+# Win32 API Prototypes
+# -----------------------------------------------------------------------------
+if os.name == "nt":
+    from ctypes import wintypes
+
+    _user32 = ctypes.WinDLL("user32", use_last_error=True)
+    _dwmapi = ctypes.WinDLL("dwmapi", use_last_error=True)
+
+    _FindWindowW = _user32.FindWindowW
+    _FindWindowW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR]
+    _FindWindowW.restype = wintypes.HWND
+
+    _SetForegroundWindow = _user32.SetForegroundWindow
+    _SetForegroundWindow.argtypes = [wintypes.HWND]
+    _SetForegroundWindow.restype = wintypes.BOOL
+
+    _GetParent = _user32.GetParent
+    _GetParent.argtypes = [wintypes.HWND]
+    _GetParent.restype = wintypes.HWND
+
+    _DwmSetWindowAttribute = _dwmapi.DwmSetWindowAttribute
+    _DwmSetWindowAttribute.argtypes = [wintypes.HWND, wintypes.DWORD, wintypes.LPCVOID, wintypes.DWORD]
+    _DwmSetWindowAttribute.restype = wintypes.LONG
 
 # -----------------------------------------------------------------------------
 # Instance Locking Functions
 # -----------------------------------------------------------------------------
-def is_process_running(pid):
-    """Return True if a process with the given PID is running."""
+def try_lock_fd(fd):
+    """Take a non-blocking OS lock on the first byte of fd. Return False if another process holds it."""
+    os.lseek(fd, 0, os.SEEK_SET)
     try:
-        os.kill(pid, 0)
+        if os.name == "nt":
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1)
     except OSError:
         return False
+    return True
+
+
+def unlock_fd(fd):
+    """Release the lock taken by try_lock_fd() on the first byte of fd."""
+    os.lseek(fd, 0, os.SEEK_SET)
+    if os.name == "nt":
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
     else:
-        return True
+        fcntl.lockf(fd, fcntl.LOCK_UN, 1)
 
 
 def bring_settings_window_to_front():
     """Bring the settings window to the front if it exists."""
     if os.name == "nt":
         try:
-            hwnd = ctypes.windll.user32.FindWindowW(None, "Settings - Open in VLC / MPC-HC Windows Helper")
+            hwnd = _FindWindowW(None, "Settings - Open in VLC / MPC-HC Windows Helper")
             if hwnd:
-                ctypes.windll.user32.SetForegroundWindow(hwnd)
+                _SetForegroundWindow(hwnd)
         except Exception as e:
             logging.warning("Error bringing settings window to front: %s", e)
 
 
 def create_instance_lock():
     """Create a lock file to prevent multiple instances from running."""
-    if os.path.exists(LOCK_FILE):
-        try:
-            with open(LOCK_FILE, "r") as f:
-                pid = int(f.read().strip())
-            if is_process_running(pid):
-                bring_settings_window_to_front()
-                sys.exit(0)
-            else:
-                os.remove(LOCK_FILE)
-        except Exception as e:
-            logging.error("Error reading instance lock file: %s", e)
-            try:
-                os.remove(LOCK_FILE)
-            except Exception:
-                pass
+    global lock_fd
     try:
-        with open(LOCK_FILE, "w") as f:
-            f.write(str(os.getpid()))
-    except Exception as e:
+        try:
+            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_RDWR)
+        except FileExistsError:
+            # The file is either held by a live instance or left behind by one that died;
+            # only the live owner still holds the OS lock on it.
+            fd = os.open(LOCK_FILE, os.O_RDWR)
+        if not try_lock_fd(fd):
+            os.close(fd)
+            bring_settings_window_to_front()
+            sys.exit(0)
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n{os.path.basename(sys.executable)}".encode())
+    except OSError as e:
         logging.error("Error creating instance lock: %s", e)
         sys.exit(1)
+    lock_fd = fd
 
 
 def remove_instance_lock():
-    """Remove the instance lock file on exit."""
-    if os.path.exists(LOCK_FILE):
-        try:
-            os.remove(LOCK_FILE)
-        except Exception as e:
-            logging.error("Error removing instance lock: %s", e)
+    """Release the instance lock on exit."""
+    global lock_fd
+    if lock_fd is None:
+        return
+    # The file itself stays: the OS lock, not the file's presence, marks a live instance,
+    # and unlinking after unlocking would race with an instance that just locked it.
+    fd, lock_fd = lock_fd, None
+    try:
+        os.ftruncate(fd, 0)
+        # Unlock explicitly: Windows may release locks still held at close only after a delay,
+        # which would make a quick relaunch think this instance is still alive.
+        unlock_fd(fd)
+    except OSError as e:
+        logging.error("Error releasing instance lock: %s", e)
+    finally:
+        os.close(fd)
 
 
 atexit.register(remove_instance_lock)
@@ -142,14 +224,13 @@ atexit.register(remove_instance_lock)
 def load_config():
     """Load configuration from a JSON file."""
     global config
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                config = json.load(f)
-        except Exception as e:
-            logging.error("Error loading config: %s", e)
-            config = {}
-    else:
+    try:
+        with open(CONFIG_FILE, "rb", buffering=65536) as f:
+            config = orjson.loads(f.read())
+    except FileNotFoundError:
+        config = {}
+    except Exception as e:
+        logging.error("Error loading config: %s", e)
         config = {}
 
     # Set default values if not present
@@ -163,9 +244,14 @@ def load_config():
 
 def save_config():
     """Save configuration to a JSON file."""
+    temp_file = CONFIG_FILE + ".tmp"
     try:
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(config, f, indent=4)
+        # Write to a temporary file and swap it in, so a crash never leaves a truncated config
+        with open(temp_file, "wb", buffering=65536) as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, CONFIG_FILE)
         logging.info("Configuration values saved.")
     except Exception as e:
         logging.error("Error saving config: %s", e)
@@ -173,133 +259,139 @@ def save_config():
 # -----------------------------------------------------------------------------
 # Media Player Path Detection via Windows Registry
 # -----------------------------------------------------------------------------
-def get_installed_path_current_user(registry_path, value_name):
+VLC_REGISTRY_KEYS = ((r"SOFTWARE\VideoLAN\VLC", "InstallDir"),)
+MPC_REGISTRY_KEYS = ((r"SOFTWARE\MPC-HC\MPC-HC", "ExePath"),)
+
+
+def _query(hive_handle, registry_path, value_name, view):
+    """Read a registry value through an already-open hive handle, in the given 32/64-bit view."""
     try:
-        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, registry_path, 0, winreg.KEY_READ)
-        value, _ = winreg.QueryValueEx(key, value_name)
-        winreg.CloseKey(key)
+        with winreg.OpenKeyEx(hive_handle, registry_path, 0, winreg.KEY_READ | view) as key:
+            value, _ = winreg.QueryValueEx(key, value_name)
         return value
-    except Exception:
+    except OSError:
         return ""
 
 
-def get_installed_path_local_machine(registry_path, value_name):
+def get_installed_paths(registry_keys):
+    """Query each (path, value) key under HKCU and then HKLM, opening each hive only once."""
+    if os.name != "nt":
+        return []
+    values = []
     try:
-        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, registry_path, 0, winreg.KEY_READ)
-        value, _ = winreg.QueryValueEx(key, value_name)
-        winreg.CloseKey(key)
-        return value
-    except Exception:
-        return ""
+        with winreg.ConnectRegistry(None, winreg.HKEY_CURRENT_USER) as hkcu, \
+                winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE) as hklm:
+            for hive_handle in (hkcu, hklm):
+                for registry_path, value_name in registry_keys:
+                    # The 32-bit view maps to WOW6432Node, where 32-bit installers register
+                    for view in (winreg.KEY_WOW64_64KEY, winreg.KEY_WOW64_32KEY):
+                        values.append(_query(hive_handle, registry_path, value_name, view))
+    except OSError as e:
+        logging.warning("Error reading registry: %s", e)
+    return values
+
+
+def find_first_file(candidates):
+    """Return the first candidate path that is an existing file, or an empty string."""
+    # dict.fromkeys drops duplicates while keeping the lookup order
+    for candidate in dict.fromkeys(filter(None, candidates)):
+        if os.path.isfile(candidate):
+            return candidate
+    return ""
 
 
 def detect_vlc_install_path():
     """Automatically detect VLC installation path."""
-    vlc_paths = [
-        get_installed_path_current_user(r"SOFTWARE\VideoLAN\VLC", "InstallDir"),
-        get_installed_path_current_user(r"SOFTWARE\WOW6432Node\VideoLAN\VLC", "InstallDir"),
-        get_installed_path_local_machine(r"SOFTWARE\VideoLAN\VLC", "InstallDir"),
-        get_installed_path_local_machine(r"SOFTWARE\WOW6432Node\VideoLAN\VLC", "InstallDir"),
+    vlc_dirs = get_installed_paths(VLC_REGISTRY_KEYS)
+    vlc_dirs += [
         r"C:\Program Files\VideoLAN\VLC",
         r"C:\Program Files (x86)\VideoLAN\VLC"
     ]
-    for vlc_path in vlc_paths:
-        if vlc_path and os.path.exists(os.path.join(vlc_path, "vlc.exe")):
-            logging.info("VLC Path Detected: %s", os.path.join(vlc_path, "vlc.exe"))
-            return os.path.join(vlc_path, "vlc.exe")
-    return ""
+    vlc_path = find_first_file(os.path.join(vlc_dir, "vlc.exe") for vlc_dir in vlc_dirs if vlc_dir)
+    if vlc_path:
+        logging.info("VLC Path Detected: %s", vlc_path)
+    return vlc_path
 
 
 def detect_mpc_install_path():
     """Automatically detect MPC-HC installation path."""
-    mpc_paths = [
-        get_installed_path_current_user(r"SOFTWARE\MPC-HC\MPC-HC", "ExePath"),
-        get_installed_path_current_user(r"SOFTWARE\WOW6432Node\MPC-HC\MPC-HC", "ExePath"),
-        get_installed_path_local_machine(r"SOFTWARE\MPC-HC\MPC-HC", "ExePath"),
-        get_installed_path_local_machine(r"SOFTWARE\WOW6432Node\MPC-HC\MPC-HC", "ExePath"),
+    mpc_paths = get_installed_paths(MPC_REGISTRY_KEYS)
+    mpc_paths += [
         r"C:\Program Files\MPC-HC\mpc-hc64.exe",
         r"C:\Program Files (x86)\MPC-HC\mpc-hc.exe",
         r"C:\Program Files\Media Player Classic - Home Cinema\mpc-hc64.exe",
         r"C:\Program Files (x86)\Media Player Classic - Home Cinema\mpc-hc.exe",
         r"C:\Program Files (x86)\K-Lite Codec Pack\MPC-HC64\mpc-hc64.exe"
     ]
-    for mpc_path in mpc_paths:
-        if mpc_path and os.path.exists(mpc_path):
-            logging.info("MPC Path Detected: %s", mpc_path)
-            return mpc_path
-    return ""
+    mpc_path = find_first_file(mpc_paths)
+    if mpc_path:
+        logging.info("MPC Path Detected: %s", mpc_path)
+    return mpc_path
 
 # -----------------------------------------------------------------------------
 # HTTP Server and Request Handling
 # -----------------------------------------------------------------------------
 class RequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive lets the extension reuse one connection for its status check and launch
+    protocol_version = "HTTP/1.1"
+    timeout = 60  # Close idle keep-alive connections instead of holding a thread forever
+    server_version_string = BaseHTTPRequestHandler.server_version + " " + BaseHTTPRequestHandler.sys_version
+
     def do_GET(self):
         try:
-            parsed_url = urlparse(self.path)
-            if parsed_url.path == '/launch':
-                query_params = parse_qs(self.path.split('?', 1)[-1])
-                decoded_params = {key: unquote(values[0]) for key, values in query_params.items()}
-                player = decoded_params.get("player", "")
-                media_url = decoded_params.get("media_url", "")
+            path, _, query = self.path.partition('?')
+            if path == '/launch':
+                # parse_qsl already percent-decodes, so values must not be unquoted again
+                params = dict(parse_qsl(query))
+                player = params.get("player", "")
+                media_url = params.get("media_url", "")
                 if not player or not media_url:
-                    self.send_response(400)
-                    self.send_server_headers()
-                    self.end_headers()
-                    self.wfile.write(b'Launch request is missing required parameters')
+                    self.send_body(400, ERR_MISSING)
                     return
 
-                if player.lower() == 'mpc':
-                    player_path = config.get("mpc_path")
-                elif player.lower() == 'vlc':
-                    player_path = config.get("vlc_path")
-                else:
-                    self.send_response(400)
-                    self.send_server_headers()
-                    self.end_headers()
-                    self.wfile.write(b'Invalid media player specified. Only Media Player Classic and VLC are supported.')
+                player_key = PLAYER_KEY.get(player.lower())
+                if player_key is None:
+                    self.send_body(400, ERR_INVALID)
                     return
 
+                player_path = config.get(player_key)
+
                 if not player_path:
-                    self.send_response(400)
-                    self.send_server_headers()
-                    self.end_headers()
-                    self.wfile.write(b'Media player paths are not configured in windows helper app')
+                    self.send_body(400, ERR_UNCONFIGURED)
+                    return
+
+                # The spawn itself is asynchronous, so catch a moved or uninstalled player up front
+                if not os.path.isfile(player_path):
+                    logging.error("Media player executable not found: %s", player_path)
+                    self.send_body(500, ERR_PLAYER_NOT_FOUND)
                     return
 
                 try:
-                    subprocess.Popen([player_path, media_url])
-                    self.send_response(200)
-                    self.send_server_headers()
-                    self.end_headers()
-                    self.wfile.write(b'Media player launched')
+                    # Spawn the player off the request thread so the response returns immediately
+                    future = launch_executor.submit(launch_media_player, player_path, media_url)
+                    future.add_done_callback(log_launch_error)
+                    self.send_body(202, LAUNCH_ACCEPTED)
                 except Exception as e:
                     logging.error("Error launching media player: %s", e)
-                    self.send_response(500)
-                    self.send_server_headers()
-                    self.end_headers()
-                    self.wfile.write(str(e).encode())
-
-            elif parsed_url.path == '/status':
-                response = {
-                    'Name': 'Open in VLC / MPC-HC Windows Helper',
-                    'version': APP_VERSION,
-                    'status': 'running'
-                }
-                self.send_response(200)
-                self.send_header("Content-Type", "application/json")
-                self.send_server_headers()
-                self.end_headers()
-                self.wfile.write(json.dumps(response).encode())
+                    self.send_body(500, str(e).encode())
+
+            elif path == '/status':
+                self.send_body(200, STATUS_RESPONSE, "application/json")
             else:
-                self.send_response(404)
-                self.end_headers()
-                self.wfile.write(b'<h1>Open in VLC / MPC-HC Windows Helper.<br><br>Invalid Request</h1>')
+                self.send_body(404, ERR_NOT_FOUND)
         except Exception as e:
             logging.error("Error handling request: %s", e)
-            self.send_response(500)
-            self.send_server_headers()
-            self.end_headers()
-            self.wfile.write(str(e).encode())
+            self.send_body(500, str(e).encode())
+
+    def send_body(self, status, body, content_type=None):
+        """Send a complete response; Content-Length is required for HTTP/1.1 keep-alive."""
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_server_headers()
+        self.end_headers()
+        self.wfile.write(body)
 
     def send_server_headers(self):
         """Send headers for CORS and to prevent caching."""
@@ -311,11 +403,86 @@ class RequestHandler(BaseHTTPRequestHandler):
         self.send_header("Pragma", "no-cache")
         self.send_header("Expires", "0")
 
+    def version_string(self):
+        return self.server_version_string
+
     def log_message(self, format, *args):
         # Suppress default HTTP server logging to stdout
         return
 
 
+class HelperHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server whose loop sleeps until a client connects or shutdown() is called."""
+
+    def __init__(self, server_address, handler_class):
+        super().__init__(server_address, handler_class)
+        # shutdown() writes to this pair to wake the loop, so it never has to poll
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._loop_exited = threading.Event()
+        # Accepted keep-alive connections, cut off in server_close() so they cannot outlive the server
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def serve_forever(self, poll_interval=None):
+        self._loop_exited.clear()
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(self, selectors.EVENT_READ)
+                selector.register(self._wakeup_recv, selectors.EVENT_READ)
+                while True:
+                    ready = selector.select()
+                    if any(key.fileobj is self._wakeup_recv for key, _ in ready):
+                        break
+                    self._handle_request_noblock()
+                    self.service_actions()
+        finally:
+            self._loop_exited.set()
+
+    def shutdown(self):
+        self._wakeup_send.send(b"\0")
+        self._loop_exited.wait()
+
+    def process_request(self, request, client_address):
+        with self._connections_lock:
+            self._connections.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self._connections_lock:
+            self._connections.discard(request)
+        super().shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._wakeup_recv.close()
+        self._wakeup_send.close()
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                # The handler thread sees EOF, finishes and closes the socket itself
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def launch_media_player(player_path, media_url):
+    """Start the player with no console window and its standard streams pointed at DEVNULL."""
+    subprocess.Popen([player_path, media_url],
+                     creationflags=PLAYER_CREATION_FLAGS,
+                     close_fds=True,
+                     stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL)
+
+
+def log_launch_error(future):
+    """Log a media player launch that failed in the launcher pool."""
+    error = future.exception()
+    if error:
+        logging.error("Error launching media player: %s", error)
+
+
 def start_server(port):
     """Start the HTTP server in a separate thread."""
     global httpd
@@ -323,9 +490,9 @@ def start_server(port):
     def server_loop():
         global httpd
         try:
-            httpd = HTTPServer(("", port), RequestHandler)
+            httpd = HelperHTTPServer(("", port), RequestHandler)
             logging.info("HTTP server started on port %s", port)
-            httpd.serve_forever(poll_interval=0.5)
+            httpd.serve_forever()
         except KeyboardInterrupt:
             logging.info("KeyboardInterrupt received in server thread. Shutting down HTTP server.")
             if httpd:
@@ -345,6 +512,7 @@ def stop_server():
         httpd.server_close()
         logging.info("HTTP server stopped.")
         httpd = None
+        _probe_port.cache_clear()
 
 # -----------------------------------------------------------------------------
 # Auto-Start (Windows) Configuration
@@ -353,112 +521,180 @@ def set_auto_start(enabled):
     """Enable or disable auto-start of the helper via Windows registry."""
     if os.name != "nt":
         return
+    run_key = r"Software\Microsoft\Windows\CurrentVersion\Run"
+    value_name = "Open in VLC / MPC-HC Windows Helper"
+    if getattr(sys, 'frozen', False):
+        startup_command = f'"{sys.executable}"'
+    else:
+        startup_command = f'"{sys.executable}" "{os.path.abspath(__file__)}"'
     try:
-        run_key = r"Software\Microsoft\Windows\CurrentVersion\Run"
-        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, run_key, 0, winreg.KEY_ALL_ACCESS) as key:
+        # Skip the write entirely when the Run entry already matches what we want
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, run_key, 0, winreg.KEY_READ) as key:
+            try:
+                current_command, _ = winreg.QueryValueEx(key, value_name)
+            except FileNotFoundError:
+                current_command = None
+        desired_command = startup_command if enabled else None
+        if current_command == desired_command:
+            return
+
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, run_key, 0, winreg.KEY_SET_VALUE) as key:
             if enabled:
-                if getattr(sys, 'frozen', False):
-                    startup_command = f'"{sys.executable}"'
-                else:
-                    startup_command = f'"{sys.executable}" "{os.path.abspath(__file__)}"'
-                winreg.SetValueEx(key, "Open in VLC / MPC-HC Windows Helper", 0, winreg.REG_SZ, startup_command)
+                winreg.SetValueEx(key, value_name, 0, winreg.REG_SZ, startup_command)
                 logging.info("Auto–start with Windows enabled.")
             else:
-                try:
-                    winreg.DeleteValue(key, "Open in VLC / MPC-HC Windows Helper")
-                    logging.info("Auto–start with Windows disabled.")
-                except FileNotFoundError:
-                    logging.info("Auto–start registry key not found.")
+                winreg.DeleteValue(key, value_name)
+                logging.info("Auto–start with Windows disabled.")
     except Exception as e:
         logging.error("Error setting auto–start with Windows: %s", e)
 
 # -----------------------------------------------------------------------------
 # Port Checking Helper
 # -----------------------------------------------------------------------------
-def is_port_in_use(port):
-    """Return True if the specified port is already in use."""
+@functools.lru_cache(maxsize=8)
+def _probe_port(port):
+    """Bind a throwaway socket to the port; the result is cached until the server stops."""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        if os.name == "nt":
+            # Without exclusive use, Windows lets the bind succeed on a port another socket is using
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
         try:
             s.bind(("127.0.0.1", port))
             return False
         except OSError:
             return True
 
+
+def is_port_in_use(port, fresh=False):
+    """Return True if the specified port is already in use; fresh=True discards cached probes first."""
+    if fresh:
+        _probe_port.cache_clear()
+    return _probe_port(port)
+
+# -----------------------------------------------------------------------------
+# UI Thread: Shared Tk Root
+# -----------------------------------------------------------------------------
+def ui_loop():
+    """Create the hidden Tk root and run its event loop for the life of the process."""
+    global ui_root, ui_error, tk, ttk, messagebox, filedialog
+    try:
+        # tkinter is only needed once a window is shown, so keep it off the startup path
+        import tkinter as tk
+        from tkinter import ttk, messagebox, filedialog
+        ui_root = tk.Tk()
+        ui_root.withdraw()
+    except Exception as e:
+        # Wake the waiting callers so they can raise the error instead of blocking forever
+        ui_error = e
+        ui_ready.set()
+        return
+    ui_root.after(0, ui_ready.set)
+    ui_root.mainloop()
+
+
+def start_ui_thread():
+    """Start the UI thread once and wait until its event loop is running. Raises if Tk failed to start."""
+    global ui_thread
+    with ui_thread_lock:
+        if ui_thread is None:
+            ui_thread = threading.Thread(target=ui_loop, name="ui", daemon=True)
+            ui_thread.start()
+    ui_ready.wait()
+    if ui_error is not None:
+        raise ui_error
+
+
+def run_in_ui_thread(func, *args):
+    """Run func on the UI thread, block until it returns and hand back its result or raise its error."""
+    start_ui_thread()
+    if threading.current_thread() is ui_thread:
+        return func(*args)
+    done = threading.Event()
+    result = []
+    error = []
+
+    def call():
+        try:
+            result.append(func(*args))
+        except Exception as e:
+            error.append(e)
+        finally:
+            done.set()
+
+    # Tkinter forwards calls made from other threads to the thread running mainloop
+    ui_root.after(0, call)
+    done.wait()
+    if error:
+        raise error[0]
+    return result[0]
+
+
+def apply_theme(root):
+    """Load the ttk theme and custom styles into the shared Tk interpreter once."""
+    global theme_loaded
+    if theme_loaded:
+        return
+    style = ttk.Style(root)
+
+    # A missing theme file surfaces as a TclError from "source", same as a broken one
+    try:
+        root.tk.call("source", THEME_FILE)
+        style.theme_use("forest-light")
+    except Exception as e:
+        logging.warning("Could not load custom theme, using default. Error: %s", e)
+        style.theme_use("clam")
+
+    # Custom styles
+    style.configure("Custom.TLabel", background=WINDOW_BG_COLOR, font=("Segoe UI", 11))
+    style.configure("Custom.TEntry", font=("Segoe UI", 11), padding=(6, 0, 6, 0))
+    style.configure("Custom.TCheckbutton", font=("Segoe UI", 10), background=WINDOW_BG_COLOR)
+    style.map("Custom.TCheckbutton", background=[("active", WINDOW_BG_COLOR), ("!active", WINDOW_BG_COLOR)])
+    style.configure("Custom.TFrame", background=WINDOW_BG_COLOR)
+    theme_loaded = True
+
 # -----------------------------------------------------------------------------
 # UI Helper: Show Error Message
 # -----------------------------------------------------------------------------
 def show_error_message(title, message):
-    temp_root = tk.Tk()
-    temp_root.withdraw()
-    messagebox.showerror(title, message)
-    temp_root.destroy()
+    """Show a modal error dialog on the shared Tk root and wait until it is dismissed."""
+    run_in_ui_thread(lambda: messagebox.showerror(title, message, master=ui_root))
 
 
 # -----------------------------------------------------------------------------
 # Settings Window (Tkinter)
 # -----------------------------------------------------------------------------
-class SettingsWindow(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Settings - Open in VLC / MPC-HC Windows Helper")
-        self.resizable(False, False)
-        self.protocol("WM_DELETE_WINDOW", self.on_close)
-        window_bg_color = "#EFEFEF"
-        
+class SettingsWindow:
+    def __init__(self, master):
+        # Wrap a Toplevel instead of subclassing it, since tkinter is not imported at module load
+        self.window = tk.Toplevel(master)
+        self.closed = threading.Event()
+        self.window.title("Settings - Open in VLC / MPC-HC Windows Helper")
+        self.window.resizable(False, False)
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Theme and styles live in the shared interpreter, so they are only loaded on first open
+        apply_theme(master)
+
         # Apply a frame with padding
-        self.main_frame = ttk.Frame(self, padding=15, style="Custom.TFrame")
+        self.main_frame = ttk.Frame(self.window, padding=15, style="Custom.TFrame")
         self.main_frame.grid(row=0, column=0, sticky="nsew")
 
-        # Apply modern ttk theme if available
-        style = ttk.Style(self)
-
-        def get_theme_path():
-            """Returns the correct path for the ui_theme folder, supporting PyInstaller."""
-            if getattr(sys, 'frozen', False):
-                # Running inside PyInstaller bundle (OneFile mode)
-                base_path = sys._MEIPASS
-            else:
-                # Running normally in Python
-                base_path = os.path.dirname(os.path.abspath(__file__))
-            return os.path.join(base_path, "ui_theme")
-
-        theme_folder = get_theme_path()
-        theme_file = os.path.join(theme_folder, "forest-light.tcl")
-
-        if os.path.exists(theme_file):
-            try:
-                self.tk.call("source", theme_file)
-                style.theme_use("forest-light")
-            except Exception as e:
-                logging.warning("Could not load custom theme, using default. Error: %s", e)
-                style.theme_use("clam")
-        else:
-            print("Theme file not found!")
-            style.theme_use("clam")
-
-        self.configure(bg=window_bg_color)
+        self.window.configure(bg=WINDOW_BG_COLOR)
 
         # Center the window on screen
         app_width = 715
         app_height = 245
-        screen_width = self.winfo_screenwidth()
-        screen_height = self.winfo_screenheight()
+        screen_width = self.window.winfo_screenwidth()
+        screen_height = self.window.winfo_screenheight()
         screen_x_pos = (screen_width / 2) - (app_width / 2)
         screen_y_pos = (screen_height / 2) - (app_height / 2)
-        self.geometry(f'{app_width}x{app_height}+{int(screen_x_pos)}+{int(screen_y_pos)}')
+        self.window.geometry(f'{app_width}x{app_height}+{int(screen_x_pos)}+{int(screen_y_pos)}')
 
-        if os.path.exists(ICON_FILE):
-            self.iconbitmap(ICON_FILE)
+        if ICON_EXISTS:
+            self.window.iconbitmap(ICON_FILE)
 
         self.enable_dark_mode_titlebar()
 
-        # Custom styles
-        style.configure("Custom.TLabel", background=window_bg_color, font=("Segoe UI", 11))
-        style.configure("Custom.TEntry", font=("Segoe UI", 11), padding=(6, 0, 6, 0))
-        style.configure("Custom.TCheckbutton", font=("Segoe UI", 10), background=window_bg_color)
-        style.map("Custom.TCheckbutton", background=[("active", window_bg_color), ("!active", window_bg_color)])
-        style.configure("Custom.TFrame", background=window_bg_color)
-
         # Variables
         self.var_mpc = tk.StringVar(value=config.get("mpc_path", ""))
         self.var_vlc = tk.StringVar(value=config.get("vlc_path", ""))
@@ -482,7 +718,7 @@ class SettingsWindow(tk.Tk):
         # Port with 5-digit limit
         row += 1
         ttk.Label(self.main_frame, text="Connection Port:", style="Custom.TLabel").grid(row=row, column=0, sticky="w", padx=7, pady=6)
-        vcmd = (self.register(self.validate_port), '%P')
+        vcmd = (self.window.register(self.validate_port), '%P')
         self.entry_port = ttk.Entry(self.main_frame, textvariable=self.var_port, width=6, style="Custom.TEntry",
                                     validate='key', validatecommand=vcmd)
         self.entry_port.grid(row=row, column=1, sticky="w", padx=7, pady=6)
@@ -507,21 +743,17 @@ class SettingsWindow(tk.Tk):
 
     def validate_port(self, new_value):
         """Allow only up to 5 digits for the port input."""
-        if new_value == "":
-            return True
-        if new_value.isdigit() and len(new_value) <= 5:
-            return True
-        return False
+        return PORT_INPUT_RE.match(new_value) is not None
 
     def enable_dark_mode_titlebar(self):
         """Enable dark mode for the title bar (Windows 10/11)."""
         if os.name != "nt":
             return
         try:
-            hwnd = ctypes.windll.user32.GetParent(self.winfo_id())
+            hwnd = _GetParent(self.window.winfo_id())
             DWMWA_USE_IMMERSIVE_DARK_MODE = 20
             dark_mode = ctypes.c_int(1)
-            ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE, ctypes.byref(dark_mode), ctypes.sizeof(dark_mode))
+            _DwmSetWindowAttribute(hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE, ctypes.byref(dark_mode), ctypes.sizeof(dark_mode))
         except Exception as e:
             logging.warning("Failed to set dark mode titlebar: %s", e)
 
@@ -533,7 +765,8 @@ class SettingsWindow(tk.Tk):
         path = filedialog.askopenfilename(
             title="Select MPC-HC executable",
             initialdir=initial_dir,
-            filetypes=[("Executable", "*.exe")]
+            filetypes=[("Executable", "*.exe")],
+            parent=self.window
         )
         if path:
             self.var_mpc.set(path)
@@ -546,7 +779,8 @@ class SettingsWindow(tk.Tk):
         path = filedialog.askopenfilename(
             title="Select VLC executable",
             initialdir=initial_dir,
-            filetypes=[("Executable", "*.exe")]
+            filetypes=[("Executable", "*.exe")],
+            parent=self.window
         )
         if path:
             self.var_vlc.set(path)
@@ -557,11 +791,13 @@ class SettingsWindow(tk.Tk):
         old_port = config.get("port", DEFAULT_PORT)
         if new_port in restricted:
             messagebox.showerror("Restricted Port Used",
-                                 f"Port {new_port} is not allowed.\nPorts 80, 443, 21, 22, and 8080 are restricted.")
+                                 f"Port {new_port} is not allowed.\nPorts 80, 443, 21, 22, and 8080 are restricted.",
+                                 parent=self.window)
             return
-        if new_port != old_port and is_port_in_use(new_port):
+        if new_port != old_port and is_port_in_use(new_port, fresh=True):
             messagebox.showerror("Port In Use",
-                                 f"Port {new_port} is already in use by another application.\nPlease choose another port.")
+                                 f"Port {new_port} is already in use by another application.\nPlease choose another port.",
+                                 parent=self.window)
             return
 
         config["mpc_path"] = self.var_mpc.get()
@@ -576,29 +812,30 @@ class SettingsWindow(tk.Tk):
                 stop_server()
                 start_server(new_port)
             threading.Thread(target=restart_server, daemon=True).start()
-        self.destroy()
+        self.on_close()
 
     def on_close(self):
         global settings_window_instance
-        self.destroy()
-        self.update_idletasks()  # Ensure it properly cleans up
+        self.window.destroy()
         settings_window_instance = None  # Reset global instance
+        self.closed.set()
 
 
-def show_settings_window():
+def open_settings_window():
+    """Raise the settings window, creating it if needed. Must run on the UI thread."""
     global settings_window_instance
-    # Check if instance exists and is valid
-    if settings_window_instance:
-        try:
-            if settings_window_instance.winfo_exists():
-                settings_window_instance.lift()
-                settings_window_instance.focus_force()
-                return
-        except tk.TclError:
-            settings_window_instance = None  # Reset if invalid
-    # Create a new instance if no valid window exists
-    settings_window_instance = SettingsWindow()
-    settings_window_instance.mainloop()
+    if settings_window_instance is None:
+        settings_window_instance = SettingsWindow(ui_root)
+    settings_window_instance.window.lift()
+    settings_window_instance.window.focus_force()
+    return settings_window_instance
+
+
+def show_settings_window(wait=False):
+    """Show the settings window, optionally blocking until the user closes it."""
+    window = run_in_ui_thread(open_settings_window)
+    if wait and window:
+        window.closed.wait()
 
 
 # -----------------------------------------------------------------------------
@@ -609,6 +846,44 @@ def on_systray_settings(systray):
 
 
 def on_systray_quit(systray):
+    request_shutdown()
+
+
+def install_signal_handlers():
+    """Route Ctrl+C / Ctrl+Break to request_shutdown(), even while the main thread is blocked.
+
+    On Windows a Python signal handler only runs once the main thread returns from a blocking
+    Event.wait(), which may never happen. The C-level handler does write to the wakeup fd right
+    away, though, so a watcher thread reads that socket and requests shutdown itself.
+    """
+    global signal_sockets
+    # Kept at module level: if the send end were garbage-collected, recv() would return at once
+    signal_sockets = signal_recv, signal_send = socket.socketpair()
+    signal_send.setblocking(False)
+    signal.set_wakeup_fd(signal_send.fileno())
+
+    # A Python handler must be installed for the wakeup fd to be written; the watcher does the work
+    signal.signal(signal.SIGINT, lambda *_: None)
+    if os.name == "nt":
+        signal.signal(signal.SIGBREAK, lambda *_: None)
+
+    def watch_signals():
+        signal_recv.recv(1)
+        logging.info("Console interrupt received.")
+        request_shutdown()
+
+    threading.Thread(target=watch_signals, name="signals", daemon=True).start()
+
+
+def request_shutdown():
+    """Ask main() to exit, or exit right away if it is still blocked in a startup dialog."""
+    shutdown_event.set()
+    if not main_idle:
+        exit_program()
+
+
+def exit_program():
+    """Stop the server, release the instance lock and end the process."""
     stop_server()
     remove_instance_lock()
     logging.info("Exiting program.")
@@ -616,6 +891,10 @@ def on_systray_quit(systray):
 
 
 def start_systray():
+    try:
+        from infi.systray import SysTrayIcon
+    except ImportError:
+        sys.exit("Please install infi.systray: pip install infi.systray")
     menu_options = (("Open Settings", None, on_systray_settings),)
     tray = SysTrayIcon(ICON_FILE, "Open in VLC / MPC-HC Windows Helper", menu_options, on_quit=on_systray_quit)
     tray.start()
@@ -624,48 +903,54 @@ def start_systray():
 # Main Program Entry Point
 # -----------------------------------------------------------------------------
 def main():
-    global config
+    global config, main_idle
+    # Installed first so Ctrl+C also works while startup dialogs are open
+    install_signal_handlers()
     load_config()
     create_instance_lock()
     start_systray()
 
     # Auto-detect media player paths if not set
+    dirty = False
     if not config.get("mpc_path"):
         config["mpc_path"] = detect_mpc_install_path()
-        save_config()
+        dirty = dirty or bool(config["mpc_path"])
     if not config.get("vlc_path"):
         config["vlc_path"] = detect_vlc_install_path()
-        save_config()
+        dirty = dirty or bool(config["vlc_path"])
     if not config.get("port"):
         config["port"] = DEFAULT_PORT
+        dirty = True
+    if dirty:
         save_config()
 
     port = config.get("port", DEFAULT_PORT)
+    server_started = False
     if is_port_in_use(port):
         logging.error("Port %s is already in use by another application. Please change it in settings/config.", port)
         show_error_message("Port Already In Use",
                            f"Port {port} is already in use by another application.\nPlease change it in settings.")
-        show_settings_window()
-        port = config.get("port", DEFAULT_PORT)
-        if is_port_in_use(port):
+        show_settings_window(wait=True)
+        if config.get("port", DEFAULT_PORT) != port:
+            # save_settings already probed the new port and is starting the server on it;
+            # probing again here would race with that bind.
+            server_started = True
+        # Same port kept: the user may have freed it meanwhile, so the first probe no longer counts
+        elif is_port_in_use(port, fresh=True):
             show_error_message("Port Already In Use",
-                               f"New port {port} is also in use by another application.\nExiting program. Try again after changing port.")
+                               f"Port {port} is still in use by another application.\nExiting program. Try again after changing port.")
             sys.exit(1)
 
-    if httpd is None:
+    if not server_started:
         start_server(port)
     set_auto_start(config.get("auto_start", True))
     if not config.get("mpc_path") or not config.get("vlc_path"):
         show_settings_window()
 
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        stop_server()
-        remove_instance_lock()
-        logging.info("Exiting program.")
-        os._exit(0)
+    # Block without waking up until the tray menu or a console signal asks us to quit
+    main_idle = True
+    shutdown_event.wait()
+    exit_program()
 
 
 if __name__ == "__main__":
@@ -1 +1 @@
-pip install pyinstaller customtkinter infi.systray psutil requests pywin32
\ No newline at end of file
+pip install pyinstaller customtkinter infi.systray psutil requests pywin32 orjson
\ No newline at end of file